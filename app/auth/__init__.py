@@ -1,2 +1,2 @@
-from .utils import authenticate_user, create_access_token, get_password_hash, verify_password
+from .utils import authenticate_user, create_access_token, decode_access_token, decode_access_token_cached, get_password_hash, get_password_hash_async, invalidate_user_cache, verify_password, verify_password_async
 from .dependencies import CurrentUser, get_current_active_user, get_current_user
\ No newline at end of file
@@ -1,13 +1,10 @@
 from typing import Annotated
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-import jwt
 from jwt.exceptions import InvalidTokenError
 from app.database import SessionDep
 from app.models import User
-from app.schemas import TokenData
-from app.config import SECRET_KEY, ALGORITHM
-from .utils import get_user_by_username
+from .utils import decode_access_token_cached, get_user_by_username
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -15,20 +12,22 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)], session: SessionDep
 ):
+    # built per call: a shared instance would keep every raise's traceback
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_access_token_cached(token)
         username = payload.get("sub")
         if username is None:
             raise credentials_exception
-        token_data = TokenData(username=username)
     except InvalidTokenError:
         raise credentials_exception
-    user = get_user_by_username(session, username=token_data.username)
+    user = await get_user_by_username(
+        session, username=username, user_id=payload.get("uid")
+    )
     if user is None:
         raise credentials_exception
     return user
@@ -42,4 +41,4 @@ async def get_current_active_user(
     return current_user
 
 
-CurrentUser = Annotated[User, Depends(get_current_active_user)]
\ No newline at end of file
+CurrentUser = Annotated[User, Depends(get_current_active_user)]
@@ -1,46 +1,165 @@
-from dataclasses import dataclass
+import base64
 from datetime import datetime, timedelta, timezone
+import hashlib
+import threading
+import time
+import anyio
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 import bcrypt
+from cachetools import TTLCache
 import jwt
-from passlib.context import CryptContext
-from sqlmodel import Session, select
+import orjson
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.models import User
-from app.config import SECRET_KEY, ALGORITHM
+from app.config import SECRET_KEY, ALGORITHM, JWT_CACHE_TTL_SECONDS, USER_CACHE_TTL_SECONDS
 
+# prepared once instead of per encode/decode call
+_JWT_KEY = SECRET_KEY.encode("utf-8") if SECRET_KEY else None
+_JWT_ALGORITHMS = (ALGORITHM,)
 
-@dataclass
-class SolveBugBcryptWarning:
-    __version__: str = getattr(bcrypt, "__version__")
+password_hasher = PasswordHasher(time_cost=3, memory_cost=64 * 1024, parallelism=4)
 
 
-setattr(bcrypt, "__about__", SolveBugBcryptWarning())
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+def _is_bcrypt_hash(hashed_password: str) -> bool:
+    # rows created before the switch to argon2id
+    return hashed_password.startswith("$2")
 
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    if _is_bcrypt_hash(hashed_password):
+        return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+    try:
+        return password_hasher.verify(hashed_password, plain_password)
+    except (VerificationError, InvalidHashError):
+        return False
 
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
 
 
-def get_user_by_username(session: Session, username: str):
-    username_cleaned = username.lower().strip()
-    statement = select(User).where(User.username == username_cleaned)
-    user = session.exec(statement).first()
-    return user
+def password_needs_rehash(hashed_password: str) -> bool:
+    return _is_bcrypt_hash(hashed_password) or password_hasher.check_needs_rehash(hashed_password)
+
+
+# password hashing is deliberately slow; run it in worker threads, but cap
+# how many at once so a login flood can't occupy the whole threadpool
+PASSWORD_HASH_CONCURRENCY = 4
+_password_limiter: anyio.CapacityLimiter | None = None
+
+
+def _get_password_limiter() -> anyio.CapacityLimiter:
+    # created lazily, it has to be made inside the running event loop
+    global _password_limiter
+    if _password_limiter is None:
+        _password_limiter = anyio.CapacityLimiter(PASSWORD_HASH_CONCURRENCY)
+    return _password_limiter
+
+
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    return await anyio.to_thread.run_sync(
+        verify_password, plain_password, hashed_password, limiter=_get_password_limiter()
+    )
+
+
+async def get_password_hash_async(password) -> str:
+    return await anyio.to_thread.run_sync(
+        get_password_hash, password, limiter=_get_password_limiter()
+    )
+
+
+# detached User snapshots keyed by cleaned username, see invalidate_user_cache;
+# invalidation only reaches this process, the ttl covers the other workers
+_user_cache: TTLCache = TTLCache(maxsize=4096, ttl=USER_CACHE_TTL_SECONDS)
+_user_cache_lock = threading.Lock()
+
+
+def _clean_username(username: str) -> str:
+    return username.lower().strip()
+
+
+async def get_user_by_username(
+    session: AsyncSession, username: str, user_id: int | None = None
+):
+    username_cleaned = _clean_username(username)
+    with _user_cache_lock:
+        user = _user_cache.get(username_cleaned)
+    if user is not None:
+        # the name may have been taken over by another account since the
+        # token was issued
+        if user_id is not None and user.id != user_id:
+            return None
+        return user
+
+    if user_id is not None:
+        # primary key lookup when the caller knows the id (the token's uid
+        # claim); a user renamed since then no longer matches
+        user = await session.get(User, user_id)
+        if user is not None and user.username != username_cleaned:
+            user = None
+    else:
+        statement = select(User).where(User.username == username_cleaned)
+        result = await session.exec(statement)
+        user = result.first()
+    if user is None:
+        return None
+
+    # cache a copy that isn't bound to this request's session
+    snapshot = User.model_validate(user)
+    with _user_cache_lock:
+        _user_cache[username_cleaned] = snapshot
+    return snapshot
 
 
-def authenticate_user(session: Session, username: str, password: str):
-    user = get_user_by_username(session, username)
+async def username_exists(session: AsyncSession, username: str) -> bool:
+    username_cleaned = _clean_username(username)
+    with _user_cache_lock:
+        if username_cleaned in _user_cache:
+            return True
+
+    statement = select(User.id).where(User.username == username_cleaned).limit(1)
+    result = await session.exec(statement)
+    return result.first() is not None
+
+
+def invalidate_user_cache(username: str) -> None:
+    with _user_cache_lock:
+        _user_cache.pop(_clean_username(username), None)
+
+
+async def get_user_auth_row(session: AsyncSession, username: str):
+    """Fetch only the columns the login path needs, without hydrating a User"""
+    statement = select(User.id, User.username, User.hashed_password, User.disabled).where(
+        User.username == _clean_username(username)
+    )
+    result = await session.exec(statement)
+    return result.first()
+
+
+async def authenticate_user(session: AsyncSession, username: str, password: str):
+    user = await get_user_auth_row(session, username)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return False
+    if password_needs_rehash(user.hashed_password):
+        await _rehash_password(session, user.id, password)
     return user
 
 
+async def _rehash_password(session: AsyncSession, user_id: int, password: str) -> None:
+    hashed_password = await get_password_hash_async(password)
+    user_db = await session.get(User, user_id)
+    if not user_db:
+        return
+    user_db.hashed_password = hashed_password
+    session.add(user_db)
+    await session.commit()
+    invalidate_user_cache(user_db.username)
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     if expires_delta:
@@ -48,5 +167,47 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     else:
         expire = datetime.now(timezone.utc) + timedelta(days=3)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
\ No newline at end of file
+    encoded_jwt = jwt.encode(to_encode, _JWT_KEY, algorithm=ALGORITHM)
+    return encoded_jwt
+
+
+def decode_access_token(token: str) -> dict:
+    return jwt.decode(token, _JWT_KEY, algorithms=_JWT_ALGORITHMS)
+
+# decoded payloads keyed by a truncated sha256 of the raw token
+_jwt_cache: TTLCache = TTLCache(maxsize=10_000, ttl=JWT_CACHE_TTL_SECONDS)
+_jwt_cache_lock = threading.Lock()
+
+
+def _peek_exp(token: str) -> float | None:
+    """Read the unverified exp claim, or None if the token doesn't parse"""
+    try:
+        _, payload_b64, _ = token.split(".", 2)
+        payload = base64.urlsafe_b64decode(payload_b64 + "=" * (-len(payload_b64) % 4))
+        exp = orjson.loads(payload).get("exp")
+    except (ValueError, AttributeError):
+        return None
+    return exp if isinstance(exp, (int, float)) else None
+
+
+def decode_access_token_cached(token: str) -> dict:
+    key = hashlib.sha256(token.encode()).digest()[:16]
+    with _jwt_cache_lock:
+        payload = _jwt_cache.get(key)
+    if payload is not None:
+        # the cache ttl may outlive the token itself
+        exp = payload.get("exp")
+        if exp is not None and exp <= time.time():
+            raise jwt.ExpiredSignatureError("Signature has expired")
+        return payload
+
+    # expired tokens are rejected before paying for the signature check;
+    # trusting the unverified claim here can only ever reject, never accept
+    exp = _peek_exp(token)
+    if exp is not None and exp <= time.time():
+        raise jwt.ExpiredSignatureError("Signature has expired")
+
+    payload = decode_access_token(token)
+    with _jwt_cache_lock:
+        _jwt_cache[key] = payload
+    return payload
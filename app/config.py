@@ -7,10 +7,22 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM =  os.getenv("ALGORITHM") 
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# must stay well below the token lifetime so revoked/expired tokens fall out quickly
+JWT_CACHE_TTL_SECONDS = 30
+# bounds how long another worker can serve a user row changed elsewhere
+USER_CACHE_TTL_SECONDS = 30
 REDIS_URL = os.getenv("REDIS_URL")
 
 # SQLITE_URL="sqlite:///database.db"
 
 DEV = os.environ.get("DEV", "true").lower() == "true"
+# route room broadcasts through redis so several workers can share a room's channel
+MULTI_WORKER = os.environ.get("RPS_MULTI_WORKER", "false").lower() == "true"
 SQLITE_URL = os.environ.get("SQLITE_URL", "sqlite:///./sql_app.db")
-POSTGRES_URL = os.environ.get("POSTGRES_URL")
\ No newline at end of file
+POSTGRES_URL = os.environ.get("POSTGRES_URL")
+
+# connection pool sizing, only applies to the postgres engine
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "40"))
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
@@ -1,35 +1,78 @@
 import logging
 from typing import Annotated
 from fastapi import Depends
-from sqlmodel import Session, SQLModel, create_engine
-from .config import DEV, SQLITE_URL, POSTGRES_URL
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from .config import (
+    DEV,
+    SQLITE_URL,
+    POSTGRES_URL,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+)
 
 logger = logging.getLogger(__name__)
 
+
+def _with_async_driver(url: str, driver: str):
+    # accept the plain sqlite:// / postgresql:// urls from the environment
+    return make_url(url).set(drivername=driver)
+
+
 if DEV:
     # SQLite for development
-    engine = create_engine(
-        SQLITE_URL,
-        connect_args={"check_same_thread": False}
-    )
+    engine = create_async_engine(_with_async_driver(SQLITE_URL, "sqlite+aiosqlite"))
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL + NORMAL sync: commits append to the log instead of fsyncing the db
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        # wait on a locked db instead of failing with SQLITE_BUSY straight away
+        cursor.execute("PRAGMA busy_timeout=5000")
+        # 64 MiB page cache, 256 MiB of memory-mapped reads, temp tables in memory
+        cursor.execute("PRAGMA cache_size=-65536")
+        cursor.execute("PRAGMA mmap_size=268435456")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
     logger.info("Using SQLite database for development")
 else:
     # PostgreSQL for production
     if not POSTGRES_URL:
         raise ValueError("POSTGRES_URL environment variable is required in production")
 
-    engine = create_engine(POSTGRES_URL)
+    engine = create_async_engine(
+        _with_async_driver(POSTGRES_URL, "postgresql+asyncpg"),
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True,
+    )
     logger.info("Using PostgreSQL database for production")
 
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+async def create_db_and_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
     logger.info("Database tables created")
 
 
-def get_session():
-    with Session(engine) as session:
+# expire_on_commit would make attribute access after commit lazy-load,
+# which isn't allowed outside an await in async sessions
+async_session = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+
+async def get_session():
+    async with async_session() as session:
         yield session
 
 
-SessionDep = Annotated[Session, Depends(get_session)]
\ No newline at end of file
+SessionDep = Annotated[AsyncSession, Depends(get_session)]
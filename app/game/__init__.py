@@ -1,3 +1,3 @@
 from .game_state import GameState, GameRoundState, PlayerInfo
-from .room_manager import RoomManager
-__all__ = ["GameState", "GameRoundState", "PlayerInfo", "RoomManager"]
+from .room_manager import RoomManager, room_channel
+__all__ = ["GameState", "GameRoundState", "PlayerInfo", "RoomManager", "room_channel"]
@@ -1,14 +1,23 @@
+import asyncio
 import time
-from fastapi import WebSocket
+import anyio
+from fastapi import WebSocket, status
 from rps import Game, FixedActionPlayer
 from ..models import PlayerInfo, GameRoundState
-from sqlmodel import Session, select
+from sqlalchemy import update
+from sqlmodel.ext.asyncio.session import AsyncSession
 from ..models import Room
 
 import logging
 
 log = logging.getLogger(__name__)
 
+# frames a client may fall behind by before it is disconnected; busy rooms
+# get more, since one round sends every client a frame per connected player
+OUTBOX_MIN_SIZE = 64
+# below this many players a thread handoff costs more than the round itself
+ROUND_OFFLOAD_THRESHOLD = 64
+
 
 class GameState:
 
@@ -19,8 +28,13 @@ class GameState:
         self.number_of_actions = number_of_actions
 
         self._connections: dict[str, WebSocket] = {}
+        # per-connection queues of serialized frames, drained by each socket's writer
+        self._outboxes: dict[str, asyncio.Queue[str]] = {}
         self._player_info: dict[str, PlayerInfo] = {}
         self._kicked_players: set[str] = set()
+        # insertion-ordered set of players still in the game
+        self._active_usernames: dict[str, None] = {}
+        self._active_players_cache: list[str] | None = None
 
         self.game = Game([], self.number_of_actions)
         self.game_active = False
@@ -30,6 +44,8 @@ class GameState:
         self.game_number = 0
         self.round_number = 0
         self.eliminated_players: set[str] = set()
+        self._round_lock = asyncio.Lock()
+        self._pending_closes: set[asyncio.Task] = set()
 
     def __len__(self) -> int:
         return len(self._connections)
@@ -40,18 +56,33 @@ class GameState:
 
     @property
     def active_players(self) -> list[str]:
-        return [
-            username
-            for username, info in self._player_info.items()
-            if not info.is_eliminated
-        ]
+        # shared between callers and rebuilt only after membership changes,
+        # so treat it as read-only
+        if self._active_players_cache is None:
+            self._active_players_cache = list(self._active_usernames)
+        return self._active_players_cache
+
+    @property
+    def active_count(self) -> int:
+        return len(self._active_usernames)
     
+    @property
+    def has_recipients(self) -> bool:
+        return bool(self._outboxes)
+
     @property
     def kicked_players(self) -> list[str]:
         return list(self._kicked_players)
     
 
-    async def add_player(self, user_id: str, username: str, websocket: WebSocket, session: Session) -> None:
+    async def add_player(
+        self,
+        user_id: str,
+        username: str,
+        websocket: WebSocket,
+        outbox: asyncio.Queue[str],
+        session: AsyncSession,
+    ) -> None:
         if self.is_full:
             raise ValueError(f"Room {self.room_id} is full")
         if username in self._connections:
@@ -60,70 +91,132 @@ class GameState:
             raise ValueError(f"Player {username} has been kicked")
 
         log.info(f"Adding player {username} to room {self.room_id}")
-        
-        room_db = session.get(Room, self.room_id)
-        room_db.number_of_players += 1
-        session.add(room_db)
-        session.commit()
+
+        # claim the slot before awaiting the db so concurrent joins see it
         self._connections[username] = websocket
+        self._outboxes[username] = outbox
         self._player_info[username] = PlayerInfo(
             user_id=user_id, username=username, connected_at=time.time()
-        )        
-
-    async def remove_player(self, username: str, session: Session) -> None:
-        if username not in self._connections:
-            return
-
-        log.info(f"Removing player {username} from room {self.room_id}")
-
-        room_db = session.get(Room, self.room_id)
-        room_db.number_of_players -= 1
-        session.add(room_db)
-        session.commit()
-
-
-        del self._connections[username]
-        del self._player_info[username]
+        )
+        self._active_usernames[username] = None
+        self._active_players_cache = None
+
+        await self._update_player_count(session, 1)
+
+    async def remove_player(
+        self, username: str, websocket: WebSocket, session: AsyncSession
+    ) -> bool:
+        """Remove the player if this websocket is the one that joined it"""
+        # waits out a round being resolved so the player can't vanish mid-round
+        async with self._round_lock:
+            # a second socket rejected as a duplicate must not evict the first
+            if self._connections.get(username) is not websocket:
+                return False
+            del self._connections[username]
+
+            log.info(f"Removing player {username} from room {self.room_id}")
+
+            # already gone if the connection was dropped as too slow
+            self._outboxes.pop(username, None)
+            del self._player_info[username]
+            self._active_usernames.pop(username, None)
+            self._active_players_cache = None
+
+            self.current_round.actions.pop(username, None)
+            self.current_round.ready_players.discard(username)
+
+        await self._update_player_count(session, -1)
+        return True
 
-        self.current_round.actions.pop(username, None)
-        self.current_round.ready_players.discard(username)
+    def deliver(self, payload: str) -> None:
+        """Queue an already serialized frame for every connection in the room"""
+        # from who is actually connected, not the room's unvalidated max_players
+        limit = max(OUTBOX_MIN_SIZE, 2 * len(self._outboxes))
+        stalled: list[str] | None = None
+        for username, outbox in self._outboxes.items():
+            if outbox.qsize() >= limit:
+                if stalled is None:
+                    stalled = []
+                stalled.append(username)
+                continue
+            outbox.put_nowait(payload)
+
+        if stalled:
+            for username in stalled:
+                self._drop_slow_connection(username)
+
+    def _drop_slow_connection(self, username: str) -> None:
+        # a client that can't keep up is disconnected rather than buffered
+        # without bound; its handler's cleanup removes it from the room
+        log.warning(f"Dropping {username} from room {self.room_id}: outbox full")
+        del self._outboxes[username]
+        websocket = self._connections[username]
+        task = asyncio.create_task(websocket.close(code=status.WS_1013_TRY_AGAIN_LATER))
+        self._pending_closes.add(task)
+        task.add_done_callback(self._pending_closes.discard)
+
+    async def _update_player_count(self, session: AsyncSession, delta: int) -> None:
+        # single atomic UPDATE instead of a read-modify-write round trip
+        await session.exec(
+            update(Room)
+            .where(Room.id == self.room_id)
+            .values(number_of_players=Room.number_of_players + delta)
+        )
+        await session.commit()
 
     async def submit_action(self, username: str, action: int) -> bool:
-        if username not in self._player_info:
-            return False
-        if self._player_info[username].is_eliminated:
-            return False
-        if self.game_over:
-            return False
-        if action < 0 or action >= self.number_of_actions:
-            return False
-
-        self.current_round.actions[username] = action
-        self.current_round.ready_players.add(username)
-        self._player_info[username].actions_submitted += 1
-        return True
+        # a submit during round resolution lands in the next round, not this one
+        async with self._round_lock:
+            info = self._player_info.get(username)
+            if info is None or info.is_eliminated or self.game_over:
+                return False
+            if action < 0 or action >= self.number_of_actions:
+                return False
+
+            self.current_round.actions[username] = action
+            self.current_round.ready_players.add(username)
+            info.actions_submitted += 1
+            return True
 
     def all_players_ready(self) -> bool:
-        return len(self.current_round.ready_players) == len(self.active_players)
+        return len(self.current_round.ready_players) == self.active_count
+
+    async def process_round_if_ready(self) -> dict | None:
+        """Process the round exactly once, even if several submits finish it concurrently"""
+        async with self._round_lock:
+            if not self.all_players_ready():
+                return None
+            return await self.process_round()
 
     async def process_round(self) -> dict:
         if not self.all_players_ready():
             raise ValueError("Not all players ready")
 
-        players = []
-        for username, action in self.current_round.actions.items():
-            players.append(FixedActionPlayer(username, action))
+        round_number = self.current_round.round_number
+        round_actions = dict(self.current_round.actions)
 
-        self.game.players = players
-        original_players = [player.name for player in players]
+        self.game.players = [
+            FixedActionPlayer(username, action)
+            for username, action in round_actions.items()
+        ]
         self.round_number = self.game.round_num
         self.game.round_num += 1
-        remaining_players = self.game.play_round()
-        remaining_usernames = [player.name for player in remaining_players]
-        eliminated_usernames = [name for name in original_players if name not in remaining_usernames]
+        if len(round_actions) >= ROUND_OFFLOAD_THRESHOLD:
+            # big rounds resolve off the event loop; callers hold the round
+            # lock, which submits, removals and start/reset also take
+            remaining_players = await anyio.to_thread.run_sync(self.game.play_round)
+        else:
+            remaining_players = self.game.play_round()
+        remaining_usernames = {player.name for player in remaining_players}
+        eliminated_usernames = [name for name in round_actions if name not in remaining_usernames]
         for username in eliminated_usernames:
             self.eliminated_players.add(username)
-            self._player_info[username].is_eliminated = True
+            info = self._player_info.get(username)
+            if info is not None:
+                info.is_eliminated = True
+            self._active_usernames.pop(username, None)
+        if eliminated_usernames:
+            self._active_players_cache = None
 
         remaining = self.active_players
 
@@ -132,14 +225,15 @@ class GameState:
             self.game_active = False
             self.winner = remaining[0] if remaining else None
 
+        # fresh round state so last round's actions (including those of
+        # players eliminated just now) don't carry over
+        self.current_round = GameRoundState(round_number=round_number + 1)
 
-        self.current_round.ready_players = set()
-        
         return {
-            "round": self.current_round.round_number - 1,
+            "round": round_number,
             "game_round": self.game.round_num,
             "game_number": self.game.game_num,
-            "actions": dict(self.current_round.actions),
+            "actions": round_actions,
             "eliminated": eliminated_usernames,
             "remaining": remaining,
             "game_over": self.game_over,
@@ -147,26 +241,37 @@ class GameState:
         }
 
 
-    def start_game(self) -> bool:
-        if len(self._connections) < 2:
-            return False
-        if self.game_active:
-            return False
+    async def start_game(self) -> bool:
+        # a round may be resolving in a worker thread on this same Game
+        async with self._round_lock:
+            if len(self._connections) < 2:
+                return False
+            if self.game_active:
+                return False
 
-        self.reset_game()
-        self.game_active = True
-        return True
+            self._reset_game()
+            self.game_active = True
+            return True
+
+    async def reset_game(self) -> None:
+        async with self._round_lock:
+            self._reset_game()
 
-    def reset_game(self) -> None:
+    def _reset_game(self) -> None:
         self.game_active = False
         self.game_over = False
         self.winner = None
         self.current_round = GameRoundState(round_number=1)
+
+        # only eliminated players have a flag to clear
+        for username in self.eliminated_players:
+            info = self._player_info.get(username)
+            if info is not None:
+                info.is_eliminated = False
         self.eliminated_players.clear()
-        
+        self._active_usernames = dict.fromkeys(self._player_info)
+        self._active_players_cache = None
+
         self.game.reset()
         self.round_number = self.game.round_num
         self.game_number = self.game.game_num
-
-        for info in self._player_info.values():
-            info.is_eliminated = False
@@ -1,37 +1,180 @@
 from . import GameState
 from broadcaster import Broadcast
-from sqlmodel import Session, select
-from ..models import Room
+from sqlalchemy import insert
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from ..database import async_session
+from ..models import Message, Room
 
-import json 
-import logging 
+import asyncio
+from datetime import datetime
+from functools import lru_cache
+import logging
+import orjson
 
 log = logging.getLogger(__name__)
 
+# chat rows are written in batches, whichever limit is hit first
+MESSAGE_FLUSH_INTERVAL = 0.1
+MESSAGE_FLUSH_BATCH_SIZE = 64
+
+
+@lru_cache(maxsize=1024)
+def room_channel(room_id: str) -> str:
+    return f"chatroom_{room_id}"
+
 
 class RoomManager:
-    def __init__(self, broadcast: Broadcast):
+    def __init__(self, broadcast: Broadcast | None):
+        # None keeps fanout in-process; a Broadcast relays through its channels
         self.broadcast = broadcast
         self.rooms: dict[str, GameState] = {}
+        self._message_buffer: list[dict] = []
+        self._flush_wakeup = asyncio.Event()
+        self._flush_task: asyncio.Task | None = None
+        self._stopping = False
+        # one channel subscription per room, fanned out to local connections
+        self._relays: dict[str, tuple[asyncio.Task, asyncio.Event]] = {}
+
+    def start(self) -> None:
+        self._flush_task = asyncio.create_task(self._flush_messages_loop())
+
+    async def stop(self) -> None:
+        if self._flush_task is not None:
+            # let the loop finish the flush it may be in; cancelling it
+            # mid-insert would lose the rows it already took from the buffer
+            self._stopping = True
+            self._flush_wakeup.set()
+            await self._flush_task
+            self._flush_task = None
+        for task, _ in self._relays.values():
+            task.cancel()
+        self._relays.clear()
+        await self.flush_messages()
 
-    async def get_or_create_room(self, room_id: str, session: Session) -> GameState:
+    def queue_message(
+        self, room_id: int, username: str, message: str, created_at: datetime
+    ) -> None:
+        """Buffer a chat message for the next batched insert"""
+        self._message_buffer.append(
+            {
+                "room_id": room_id,
+                "username": username,
+                "message": message,
+                "type": "message",
+                "created_at": created_at,
+            }
+        )
+        if len(self._message_buffer) >= MESSAGE_FLUSH_BATCH_SIZE:
+            self._flush_wakeup.set()
+
+    async def flush_messages(self) -> None:
+        if not self._message_buffer:
+            return
+        rows, self._message_buffer = self._message_buffer, []
+        try:
+            await self._insert_messages(rows)
+        except Exception as e:
+            if len(rows) == 1:
+                log.error(f"Failed to store chat message: {e}")
+                return
+            # retry one by one, so a single bad row can't lose the whole batch
+            log.warning(f"Failed to store {len(rows)} chat messages, retrying singly: {e}")
+            for row in rows:
+                try:
+                    await self._insert_messages([row])
+                except Exception as e:
+                    log.error(
+                        f"Failed to store chat message from {row['username']} "
+                        f"in room {row['room_id']}: {e}"
+                    )
+
+    @staticmethod
+    async def _insert_messages(rows: list[dict]) -> None:
+        async with async_session() as session:
+            await session.exec(insert(Message), params=rows)
+            await session.commit()
+
+    async def _flush_messages_loop(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), MESSAGE_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            await self.flush_messages()
+
+    async def get_or_create_room(self, room_id: str, session: AsyncSession) -> GameState:
         if room_id not in self.rooms:
-            room = session.exec(select(Room).where(Room.id == int(room_id))).first()
+            result = await session.exec(select(Room).where(Room.id == int(room_id)))
+            room = result.first()
             if not room:
                 raise ValueError(f"Room {room_id} not found in database")
 
-            self.rooms[room_id] = GameState(
+        # another connection may have created it while we awaited the query
+        if room_id not in self.rooms:
+            game_state = GameState(
                 room_id=int(room_id),
                 max_players=room.max_players,
                 number_of_actions=room.number_of_actions,
             )
-
+            self.rooms[room_id] = game_state
         return self.rooms[room_id]
 
+    async def subscribe_room(self, room_id: str) -> None:
+        """Relay the room's channel to this worker's connections, if not already"""
+        if self.broadcast is None:
+            return
+        relay = self._relays.get(room_id)
+        if relay is None or relay[0].done():
+            subscribed = asyncio.Event()
+            task = asyncio.create_task(
+                self._relay_room(room_id, self.rooms[room_id], subscribed)
+            )
+            relay = self._relays[room_id] = (task, subscribed)
+        # don't let the joining player broadcast until the channel is
+        # subscribed, or its own events could be missed
+        await relay[1].wait()
+
+    def release_room(self, room_id: str) -> None:
+        """Drop the room's relay once no local connection is left to receive it"""
+        room = self.rooms.get(room_id)
+        if room is not None and room.has_recipients:
+            return
+        relay = self._relays.pop(room_id, None)
+        if relay is not None:
+            # leaving the subscribe() block unsubscribes the channel
+            relay[0].cancel()
+
+    async def _relay_room(
+        self, room_id: str, room: GameState, subscribed: asyncio.Event
+    ) -> None:
+        try:
+            async with self.broadcast.subscribe(channel=room_channel(room_id)) as subscriber:
+                subscribed.set()
+                async for event in subscriber:
+                    room.deliver(event.message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.error(f"Relay for room {room_id} stopped: {e}")
+        finally:
+            # never leave joiners waiting on a relay that is gone
+            subscribed.set()
+
     async def broadcast_to_room(self, room_id: str, message: dict) -> None:
-        await self.broadcast.publish(
-            channel=f"chatroom_{room_id}", message=json.dumps(message)
-        )
+        # serialized once here; every connection is sent the same string
+        if self.broadcast is not None:
+            await self.broadcast.publish(
+                channel=room_channel(room_id), message=orjson.dumps(message).decode()
+            )
+            return
+
+        room = self.rooms.get(room_id)
+        # e.g. the player_left of a room's last player has no one to reach
+        if room is None or not room.has_recipients:
+            return
+        room.deliver(orjson.dumps(message).decode())
 
     async def handle_player_action(
         self, room_id: str, username: str, action: int
@@ -47,16 +190,17 @@ class RoomManager:
                     "type": "player_ready",
                     "username": username,
                     "ready_count": len(room.current_round.ready_players),
-                    "total_active": len(room.active_players),
+                    "total_active": room.active_count,
                 },
             )
 
             if room.all_players_ready():
                 try:
-                    results = await room.process_round()
-                    await self.broadcast_to_room(
-                        room_id, {"type": "round_complete", **results}
-                    )
+                    results = await room.process_round_if_ready()
+                    if results is not None:
+                        await self.broadcast_to_room(
+                            room_id, {"type": "round_complete", **results}
+                        )
                 except Exception as e:
                     log.error(f"Error processing round: {e}")
                     await self.broadcast_to_room(
@@ -1,37 +1,23 @@
 import base64
 import hashlib
+from functools import lru_cache
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import pad, unpad
 
 
-class EncLibrary:
-    def __init__(self):
-        self._pair_key = self._get_pair_key()
-
-    def _get_pair_key(self):
-        """Returns the pair key arrays for substitution cipher"""
-        pair_key = [[], []]
-
-        pair_key[0] = [
-            'A', 'd', 'K', 'a', '!', '6', 'y', 'r', '7', 'M', ')',
-            '(', 'z', 'U', '`', '{', 'V', '[', '#', 'f', '1', '8',
-            ':', 'o', 'x', '@', 'L', 'R', 'G', '%', '&', '^', ';',
-            'P', '=', 'e', '}', 'i', 'D', 'T', 's', 'S', '>', '-',
-            '/', ',', '+', '<', 'v', ']', 't', '~', 'C', 'u', '$',
-            'N', '_', 'j', '*', '?', 'c', 'q', '.', 'J', 'O'
-        ]
-
-        pair_key[1] = [
-            'O', 'N', 'L', 'Y', 'b', 'y', 'G', 'R', 'A', 'C', 'E',
-            'j', 'Q', 'g', 'w', 'B', 'h', 'x', 'S', 'i', 'D', 'T',
-            'z', 'U', 'k', '0', 'F', 'V', 'l', '1', 'W', 'm', '2',
-            'H', 'X', 'n', '3', 'I', 'o', '4', 'J', 'Z', 'p', '5',
-            'K', 'a', 'q', '6', 'r', '7', 'M', 'c', 's', '8', 'd',
-            't', '9', 'e', 'u', '+', 'P', 'f', 'v', '/', '='
-        ]
-
-        return pair_key
+# substitution cipher pair keys: a character at index i of _PAIR_KEY_1 is
+# swapped for the character at the same index of _PAIR_KEY_0
+_PAIR_KEY_0 = 'AdKa!6yr7M)(zU`{V[#f18:ox@LRG%&^;P=e}iDTsS>-/,+<v]t~Cu$N_j*?cq.JO'
+_PAIR_KEY_1 = 'ONLYbyGRACEjQgwBhxSiDTzUk0FVl1Wm2HXn3Io4JZp5Kaq6r7Mcs8dt9eu+Pfv/='
+
+# base64 output is ascii, so encryption can translate the raw bytes
+_ENC_TABLE = bytes.maketrans(_PAIR_KEY_1.encode('ascii'), _PAIR_KEY_0.encode('ascii'))
+_DEC_TABLE = str.maketrans(_PAIR_KEY_0, _PAIR_KEY_1)
+# wd_enc output for each code point modulo 256
+_WD_TABLE = tuple(str((i + 73) % 256) for i in range(256))
+
 
+class EncLibrary:
     def base64_enc(self, value, encoding='utf-8'):
         """Base64 encode a string"""
         if value is None:
@@ -53,43 +39,25 @@ class EncLibrary:
         if not value or value.isspace():
             return ''
 
-        base64_text = self.base64_enc(value)
-        result = []
-
-        for char in base64_text:
-            try:
-                idx = self._pair_key[1].index(char)
-                result.append(self._pair_key[0][idx])
-            except ValueError:
-                result.append(char)
-
-        return ''.join(result)
+        # characters outside the key are left as they are
+        return base64.b64encode(value.encode('utf-8')).translate(_ENC_TABLE).decode('ascii')
 
     def two_way_dec(self, value):
         """Two-way decryption using character substitution"""
         if not value or value.isspace():
             return ''
 
-        result = []
-
-        for char in value:
-            try:
-                idx = self._pair_key[0].index(char)
-                result.append(self._pair_key[1][idx])
-            except ValueError:
-                result.append(char)
+        return self.base64_dec(value.translate(_DEC_TABLE))
 
-        base64_text = ''.join(result)
-        return self.base64_dec(base64_text)
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def _aes_key(key):
+        """Prepare key - truncate or pad to 16 bytes"""
+        return key.encode('utf-8')[:16].ljust(16, b'\0')
 
     def two_way_enc_aes(self, key, value):
         """Two-way encryption using AES"""
-        # Prepare key - truncate or pad to 16 bytes
-        key_bytes = key.encode('utf-8')
-        if len(key_bytes) > 16:
-            key_bytes = key_bytes[:16]
-        else:
-            key_bytes = key_bytes.ljust(16, b'\0')
+        key_bytes = self._aes_key(key)
 
         # Create cipher with CBC mode
         cipher = AES.new(key_bytes, AES.MODE_CBC, key_bytes)
@@ -104,12 +72,7 @@ class EncLibrary:
     def two_way_dec_aes(self, key, value):
         """Two-way decryption using AES"""
         try:
-            # Prepare key - truncate or pad to 16 bytes
-            key_bytes = key.encode('utf-8')
-            if len(key_bytes) > 16:
-                key_bytes = key_bytes[:16]
-            else:
-                key_bytes = key_bytes.ljust(16, b'\0')
+            key_bytes = self._aes_key(key)
 
             # Create cipher with CBC mode
             cipher = AES.new(key_bytes, AES.MODE_CBC, key_bytes)
@@ -125,25 +88,16 @@ class EncLibrary:
 
     def one_way_enc(self, value):
         """One-way encryption using SHA1"""
-        sha1 = hashlib.sha1()
-        sha1.update(value.encode('utf-8'))
-        return base64.b64encode(sha1.digest()).decode('ascii')
+        digest = hashlib.sha1(value.encode('utf-8'), usedforsecurity=False).digest()
+        return base64.b64encode(digest).decode('ascii')
 
     def wd_enc(self, value):
         """Custom encoding function"""
         if not value or value.isspace():
             return ''
 
-        result = []
-
-        for char in value:
-            # Get ASCII code
-            c_code = ord(char)
-            # Apply transformation
-            c_code = (c_code + 73) % 256
-            result.append(str(c_code))
-
-        return ' '.join(result)
+        # (code + 73) % 256 only depends on the low byte of the code point
+        return ' '.join([_WD_TABLE[ord(char) & 0xff] for char in value])
 
 
 # Example usage:
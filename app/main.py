@@ -1,27 +1,32 @@
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from app.database import create_db_and_tables
 from app.middleware import add_cors_middleware
-from app.routers import auth_router, users_router, rooms_router, websocket_router, init_room_manager
+from app.routers import auth_router, users_router, rooms_router, websocket_router, init_room_manager, shutdown_room_manager
 
 from broadcaster import Broadcast
-from .config import REDIS_URL
+from .config import MULTI_WORKER, REDIS_URL
 
 
-broadcast = Broadcast(REDIS_URL)
+# redis is only needed when rooms are shared across workers
+broadcast = Broadcast(REDIS_URL) if MULTI_WORKER else None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_db_and_tables()
-    await broadcast.connect()
+    await create_db_and_tables()
+    if broadcast is not None:
+        await broadcast.connect()
     await init_room_manager(broadcast)
     yield
-    await broadcast.disconnect()
+    await shutdown_room_manager()
+    if broadcast is not None:
+        await broadcast.disconnect()
     print("shutting down")
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 app.add_middleware(add_cors_middleware)
 
 app.include_router(auth_router)
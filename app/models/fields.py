@@ -0,0 +1,11 @@
+from datetime import datetime, timezone
+from sqlalchemy import DateTime
+from sqlmodel import Field
+
+
+def created_at_field():
+    # timestamptz on postgres; asyncpg rejects aware datetimes for naive columns
+    return Field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        sa_type=DateTime(timezone=True),
+    )
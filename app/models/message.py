@@ -1,11 +1,17 @@
-from datetime import datetime, timezone
+from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
+from .fields import created_at_field
 
 
 class Message(SQLModel, table=True):
+    # serves the "latest 50 messages in a room" history query, and any
+    # room_id-only lookup through its leading column
+    __table_args__ = (Index("ix_message_room_id_created_at", "room_id", "created_at"),)
+
     id: int | None = Field(default=None, primary_key=True)
-    room_id: int = Field(foreign_key="room.id", index=True)
+    room_id: int = Field(foreign_key="room.id")
     username: str
     message: str
     type: str
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
\ No newline at end of file
+    created_at: datetime = created_at_field()
\ No newline at end of file
@@ -1,12 +1,13 @@
 from sqlmodel import Field, SQLModel
-from datetime import datetime, timezone
+from datetime import datetime
+from .fields import created_at_field
 
 class RoomBase(SQLModel):
     room_name: str = Field(index=True)
     max_players: int = Field(default=None)
     number_of_players: int = Field(default=0)
     number_of_actions: int = Field(default=None)
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = created_at_field()
     disabled: bool = Field(default=False)
     
 
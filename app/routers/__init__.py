@@ -1,6 +1,6 @@
 from .auth import router as auth_router
 from .users import router as users_router
 from .rooms import router as rooms_router
-from .websocket_router import router as websocket_router, init_room_manager
+from .websocket_router import router as websocket_router, init_room_manager, shutdown_room_manager
 
-__all__ = ["auth_router", "users_router", "rooms_router", "websocket_router", "init_room_manager"]
+__all__ = ["auth_router", "users_router", "rooms_router", "websocket_router", "init_room_manager", "shutdown_room_manager"]
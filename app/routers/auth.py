@@ -5,30 +5,29 @@ from fastapi.security import OAuth2PasswordRequestForm
 from app.database import SessionDep
 from app.models import User
 from app.schemas import Token, UserCreate, UserPublic
-from app.auth import authenticate_user, create_access_token, get_password_hash
-from app.auth.utils import get_user_by_username
+from app.auth import authenticate_user, create_access_token, get_password_hash_async
+from app.auth.utils import username_exists
 from app.config import ACCESS_TOKEN_EXPIRE_MINUTES
 
 router = APIRouter()
 
 
 @router.post("/register", response_model=UserPublic)
-def register(user: UserCreate, session: SessionDep):
-    db_user = get_user_by_username(session, user.username)
-    if db_user:
+async def register(user: UserCreate, session: SessionDep):
+    if await username_exists(session, user.username):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered",
         )
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     db_user = User(
         username=user.username,
         hashed_password=hashed_password,
     )
     session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
+    await session.commit()
+    await session.refresh(db_user)
     return db_user
 
 
@@ -36,7 +35,7 @@ def register(user: UserCreate, session: SessionDep):
 async def login_for_access_token(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()], session: SessionDep
 ) -> Token:
-    user = authenticate_user(session, form_data.username, form_data.password)
+    user = await authenticate_user(session, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -45,6 +44,7 @@ async def login_for_access_token(
         )
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "uid": user.id},
+        expires_delta=access_token_expires,
     )
     return Token(access_token=access_token, token_type="bearer")
\ No newline at end of file
@@ -1,4 +1,6 @@
-from fastapi import APIRouter
+from typing import Annotated
+from fastapi import APIRouter, Query
+from fastapi.responses import ORJSONResponse
 from sqlmodel import select
 
 from app.auth import CurrentUser
@@ -8,6 +10,9 @@ from app.schemas import RoomCreate
 
 router = APIRouter()
 
+# plain column rows skip ORM hydration and jsonable_encoder on the read paths
+_ROOM_COLUMNS = tuple(Room.__table__.c)
+
 
 @router.post("/create-room")
 async def create_room(room: RoomCreate, session: SessionDep, current_user: CurrentUser):
@@ -19,19 +24,26 @@ async def create_room(room: RoomCreate, session: SessionDep, current_user: Curre
         created_by=current_user_id,
     )
     session.add(db_room)
-    session.commit()
-    session.refresh(db_room)
+    await session.commit()
+    await session.refresh(db_room)
     print(db_room.id)
     return db_room
 
 
 @router.get("/rooms")
-async def get_rooms(session: SessionDep):
-    rooms = session.exec(select(Room)).all()
-    return rooms
+async def get_rooms(
+        session: SessionDep,
+        offset: Annotated[int, Query(ge=0)] = 0,
+        limit: Annotated[int, Query(ge=1, le=100)] = 100,
+):
+    # ordered, so pages don't overlap or skip rooms
+    statement = select(*_ROOM_COLUMNS).order_by(Room.id).offset(offset).limit(limit)
+    result = await session.exec(statement)
+    return ORJSONResponse([row._asdict() for row in result])
 
 
 @router.get("/room/{room_id}")
 async def get_room(room_id: int, session: SessionDep):
-    room = session.exec(select(Room).where(Room.id == room_id)).first()
-    return room
\ No newline at end of file
+    result = await session.exec(select(*_ROOM_COLUMNS).where(Room.id == room_id))
+    room = result.first()
+    return ORJSONResponse(room._asdict() if room is not None else None)
\ No newline at end of file
@@ -1,11 +1,12 @@
+import hmac
 from typing import Annotated
 from fastapi import APIRouter, HTTPException, Query, status
 from sqlmodel import select, Field
 from app.database import SessionDep
 from app.models import User
 from app.schemas import UserCreate, UserPublic, UserUpdate, UserUpdatePassword, UserUpdateUsername, UserUpdateResponse, AdminResetPassword
-from app.auth import CurrentUser, get_password_hash
-from app.auth.utils import get_user_by_username, verify_password
+from app.auth import CurrentUser, get_password_hash_async, invalidate_user_cache, verify_password_async
+from app.auth.utils import username_exists
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -16,105 +17,111 @@ async def read_current_user(current_user: CurrentUser):
 
 
 @router.post("/", response_model=UserPublic)
-def create_user(user: UserCreate, session: SessionDep, current_user: CurrentUser):
-    db_user = get_user_by_username(session, user.username)
-    if db_user:
+async def create_user(user: UserCreate, session: SessionDep, current_user: CurrentUser):
+    if await username_exists(session, user.username):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Username already exists"
         )
 
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     db_user = User(
         username=user.username.lower().strip(),
         hashed_password=hashed_password,
     )
     session.add(db_user)
-    session.commit()
-    session.refresh(db_user)
+    await session.commit()
+    await session.refresh(db_user)
     return db_user
 
 
 @router.get("/", response_model=list[UserPublic])
-def read_users(
+async def read_users(
         session: SessionDep,
         current_user: CurrentUser,
         offset: int = 0,
         limit: Annotated[int, Query(le=100)] = 100,
 ):
-    users = session.exec(select(User).offset(offset).limit(limit)).all()
+    result = await session.exec(select(User).offset(offset).limit(limit))
+    users = result.all()
     return users
 
 
 @router.get("/{user_id}", response_model=UserPublic)
-def read_user(user_id: int, session: SessionDep, current_user: CurrentUser):
-    user = session.get(User, user_id)
+async def read_user(user_id: int, session: SessionDep, current_user: CurrentUser):
+    user = await session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 
 @router.patch("/{user_id}", response_model=UserPublic)
-def update_user(
+async def update_user(
         user_id: int,
         user_update: UserUpdate,
         session: SessionDep,
         current_user: CurrentUser,
 ):
-    user_db = session.get(User, user_id)
+    user_db = await session.get(User, user_id)
     if not user_db:
         raise HTTPException(status_code=404, detail="User not found")
 
     user_data = user_update.model_dump(exclude_unset=True, exclude={"password"})
 
     if user_update.password is not None:
-        user_data["hashed_password"] = get_password_hash(user_update.password)
+        user_data["hashed_password"] = await get_password_hash_async(user_update.password)
 
+    old_username = user_db.username
     user_db.sqlmodel_update(user_data)
     session.add(user_db)
-    session.commit()
-    session.refresh(user_db)
+    await session.commit()
+    invalidate_user_cache(old_username)
+    await session.refresh(user_db)
     return user_db
 
 
 @router.delete("/{user_id}")
-def delete_user(user_id: int, session: SessionDep, current_user: CurrentUser):
+async def delete_user(user_id: int, session: SessionDep, current_user: CurrentUser):
     if current_user.id == user_id:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Cannot delete your own account",
         )
 
-    user = session.get(User, user_id)
+    user = await session.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    session.delete(user)
-    session.commit()
+    username = user.username
+    await session.delete(user)
+    await session.commit()
+    invalidate_user_cache(username)
     return {"ok": True}
 
 
 @router.patch("/{user_id}/change-username")
-def change_user_username(user_id: int, user_update_username: UserUpdateUsername, session: SessionDep,
+async def change_user_username(user_id: int, user_update_username: UserUpdateUsername, session: SessionDep,
                          current_user: CurrentUser):
     if current_user.id != user_id:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You can only change your own password"
         )
-    user_db = session.get(User, user_id)
+    user_db = await session.get(User, user_id)
     if not user_db:
         raise HTTPException(status_code=404, detail="User not found")
 
     user_data = user_update_username.model_dump(exclude_unset=True, exclude={"password"})
 
+    old_username = user_db.username
     user_db.sqlmodel_update(user_data)
     session.add(user_db)
-    session.commit()
-    session.refresh(user_db)
+    await session.commit()
+    invalidate_user_cache(old_username)
+    await session.refresh(user_db)
     return user_db
 
 
 @router.patch("/{user_id}/change-password")
-def change_user_password(
+async def change_user_password(
         user_id: int,
         user_update_password: UserUpdatePassword,
         session: SessionDep,
@@ -125,28 +132,34 @@ def change_user_password(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You can only change your own password"
         )
-    user_db = session.get(User, user_id)
+    user_db = await session.get(User, user_id)
     if not user_db:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found"
         )
 
-    if not verify_password(user_update_password.current_password, user_db.hashed_password):
+    if not await verify_password_async(user_update_password.current_password, user_db.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Current password is incorrect"
         )
 
-    if verify_password(user_update_password.new_password, user_db.hashed_password):
+    # current_password verified above, so comparing the plaintexts answers
+    # "same as the stored password" without a second hash
+    if hmac.compare_digest(
+        user_update_password.new_password.encode("utf-8"),
+        user_update_password.current_password.encode("utf-8"),
+    ):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="New password must be different from current password"
         )
 
-    user_db.hashed_password = get_password_hash(user_update_password.new_password)
+    user_db.hashed_password = await get_password_hash_async(user_update_password.new_password)
     session.add(user_db)
-    session.commit()
+    await session.commit()
+    invalidate_user_cache(user_db.username)
     return UserUpdateResponse(
         message="Password changed successfully",
         user_id=user_id
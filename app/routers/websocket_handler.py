@@ -1,16 +1,22 @@
-import json
+import asyncio
 import logging
 from datetime import datetime, timezone
-from sqlmodel import Session
+import anyio
+import orjson
 from fastapi import WebSocket
 from fastapi.websockets import WebSocketState
 
-from ..models import Message
+from ..database import async_session
 from ..game import RoomManager
 
 log = logging.getLogger(__name__)
 
 
+async def send_json(websocket: WebSocket, data: dict) -> None:
+    """Send a JSON text frame, encoded with orjson instead of stdlib json"""
+    await websocket.send_text(orjson.dumps(data).decode())
+
+
 class WebSocketHandler:
     """Handles WebSocket message processing and communication"""
 
@@ -20,14 +26,19 @@ class WebSocketHandler:
             room_id: str,
             user_id: str,
             username: str,
-            session: Session,
             manager: RoomManager,
+            outbox: asyncio.Queue[str],
     ) -> None:
         """Main message handling loop for WebSocket connections"""
-        room = await manager.get_or_create_room(room_id, session)
+        async with async_session() as session:
+            room = await manager.get_or_create_room(room_id, session)
 
         try:
-            await room.add_player(user_id, username, websocket, session)
+            async with async_session() as session:
+                await room.add_player(user_id, username, websocket, outbox, session)
+            # only after the outbox is registered, so a leaver releasing the
+            # relay in between can't leave this connection unsubscribed
+            await manager.subscribe_room(room_id)
 
             await manager.broadcast_to_room(
                 room_id,
@@ -38,28 +49,46 @@ class WebSocketHandler:
                 },
             )
 
-            async for message in websocket.iter_text():
+            async for message in WebSocketHandler._iter_frames(websocket):
                 try:
-                    msg_data = json.loads(message)
+                    msg_data = orjson.loads(message)
                     await WebSocketHandler._process_message(
-                        msg_data, websocket, room_id, username, session, manager, room
+                        msg_data, websocket, room_id, username, manager, room
                     )
-                except (json.JSONDecodeError, ValueError) as e:
+                except ValueError as e:
                     log.error(f"Error processing message from {username}: {e}")
-                    await websocket.send_json(
-                        {"type": "error", "message": "Invalid message format"}
+                    await send_json(
+                        websocket, {"type": "error", "message": "Invalid message format"}
                     )
 
         finally:
-            await room.remove_player(username, session)
-            await manager.broadcast_to_room(
-                room_id,
-                {
-                    "type": "player_left",
-                    "username": username,
-                    "players": room.active_players,
-                },
-            )
+            # the task group cancels this task on disconnect; shield the
+            # cleanup so its awaits still run
+            with anyio.CancelScope(shield=True):
+                async with async_session() as session:
+                    removed = await room.remove_player(username, websocket, session)
+                # nothing to undo if this connection never got into the room
+                if removed:
+                    await manager.broadcast_to_room(
+                        room_id,
+                        {
+                            "type": "player_left",
+                            "username": username,
+                            "players": room.active_players,
+                        },
+                    )
+                    manager.release_room(room_id)
+
+    @staticmethod
+    async def _iter_frames(websocket: WebSocket):
+        """Yield raw frame payloads, bytes for binary frames and str for text"""
+        # orjson parses either directly, so binary frames are never decoded
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                return
+            payload = frame.get("bytes")
+            yield payload if payload is not None else frame.get("text")
 
     @staticmethod
     async def _process_message(
@@ -67,7 +96,6 @@ class WebSocketHandler:
             websocket: WebSocket,
             room_id: str,
             username: str,
-            session: Session,
             manager: RoomManager,
             room,
     ) -> None:
@@ -88,7 +116,7 @@ class WebSocketHandler:
             await WebSocketHandler._handle_reset_game(room_id, manager, room)
         elif msg_type == "message":
             await WebSocketHandler._handle_chat_message(
-                msg_data, room_id, username, session, manager
+                msg_data, room_id, username, manager
             )
 
     @staticmethod
@@ -102,7 +130,7 @@ class WebSocketHandler:
     @staticmethod
     async def _handle_start_game(room_id: str, manager: RoomManager, room) -> None:
         """Handle game start requests"""
-        if room.start_game():
+        if await room.start_game():
             await manager.broadcast_to_room(
                 room_id,
                 {"type": "game_started", "players": room.active_players},
@@ -121,33 +149,36 @@ class WebSocketHandler:
         target_username = msg_data.get("target", "")
 
         if host_username not in room._player_info:
-            await websocket.send_json({"type": "error", "message": "Unauthorized"})
+            await send_json(websocket, {"type": "error", "message": "Unauthorized"})
             return
 
-        if target_username not in room._connections:
-            await websocket.send_json({"type": "error", "message": "Player not found"})
+        target_ws = room._connections.get(target_username)
+        if target_ws is None:
+            await send_json(websocket, {"type": "error", "message": "Player not found"})
             return
 
-        target_ws = room._connections[target_username]
-        await target_ws.close(code=4001, reason="Kicked by host")
+        # mark first so the kicked player can't rejoin while the close is in flight
         room._kicked_players.add(target_username)
 
-        await manager.broadcast_to_room(
-            room_id,
-            {
-                "type": "kick_player",
-                "host": host_username,
-                "kick_player": target_username,
-                "players": room.active_players,
-                "kicked_players": room.kicked_players,
-            },
+        await asyncio.gather(
+            target_ws.close(code=4001, reason="Kicked by host"),
+            manager.broadcast_to_room(
+                room_id,
+                {
+                    "type": "kick_player",
+                    "host": host_username,
+                    "kick_player": target_username,
+                    "players": room.active_players,
+                    "kicked_players": room.kicked_players,
+                },
+            ),
         )
 
     @staticmethod
     async def _handle_reset_game(room_id: str, manager: RoomManager, room) -> None:
         """Handle game reset requests"""
         if room.game_over:
-            room.reset_game()
+            await room.reset_game()
             print(room)
             await manager.broadcast_to_room(
                 room_id,
@@ -165,35 +196,37 @@ class WebSocketHandler:
             msg_data: dict,
             room_id: str,
             username: str,
-            session: Session,
             manager: RoomManager,
     ) -> None:
         """Handle chat messages"""
-        db_message = Message(
-            room_id=int(room_id),
-            username=username,
-            message=msg_data.get("message", ""),
-            type="message",
-        )
-        session.add(db_message)
-        session.commit()
+        message = msg_data.get("message", "")
+        # anything else would fail the batched insert it is written with
+        if not isinstance(message, str):
+            raise ValueError(f"chat message must be a string, got {type(message).__name__}")
+        created_at = datetime.now(timezone.utc)
+        # persisted by the room manager's batched writer, not inline
+        manager.queue_message(int(room_id), username, message, created_at)
 
         await manager.broadcast_to_room(
             room_id,
             {
                 "type": "message",
                 "username": username,
-                "message": msg_data.get("message", ""),
-                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "message": message,
+                # orjson writes datetimes as RFC 3339, same as isoformat()
+                "timestamp": created_at,
             },
         )
 
     @staticmethod
     async def broadcast_to_client(
-            websocket: WebSocket, room_id: str, manager: RoomManager
+            websocket: WebSocket, outbox: asyncio.Queue[str]
     ) -> None:
         """Handle broadcasting messages to WebSocket client"""
-        async with manager.broadcast.subscribe(channel=f"chatroom_{room_id}") as subscriber:
-            async for event in subscriber:
-                if websocket.client_state == WebSocketState.CONNECTED:
-                    await websocket.send_text(event.message)
\ No newline at end of file
+        while True:
+            payload = await outbox.get()
+            if websocket.application_state != WebSocketState.CONNECTED:
+                # closed from our side, e.g. dropped for falling behind
+                return
+            if websocket.client_state == WebSocketState.CONNECTED:
+                await websocket.send_text(payload)
\ No newline at end of file
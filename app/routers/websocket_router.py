@@ -1,16 +1,18 @@
+import asyncio
 import logging
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 import jwt
 import anyio
 from broadcaster import Broadcast
 
 from ..models import Message
-from ..config import SECRET_KEY, ALGORITHM
-from ..database import get_session
-from .auth import get_user_by_username
-from .websocket_handler import WebSocketHandler
+from ..auth import decode_access_token_cached
+from ..database import async_session
+from ..auth.utils import get_user_by_username
+from .websocket_handler import WebSocketHandler, send_json
 
-from fastapi import APIRouter, Depends, Query, WebSocket, status
+from fastapi import APIRouter, Query, WebSocket, status
 from ..game import RoomManager
 
 log = logging.getLogger(__name__)
@@ -27,7 +29,7 @@ def get_room_manager() -> RoomManager:
 
 
 async def authenticate_websocket(
-        websocket: WebSocket, token: str | None, session: Session
+        websocket: WebSocket, token: str | None, session: AsyncSession
 ) -> tuple[str, str] | None:
     """Authenticate WebSocket connection and return user_id and username"""
     if not token:
@@ -35,13 +37,16 @@ async def authenticate_websocket(
         return None
 
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        # reconnects within the cache window skip the signature check
+        payload = decode_access_token_cached(token)
         username = payload.get("sub")
         if not username:
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
             return None
 
-        current_user = get_user_by_username(session, username=username)
+        current_user = await get_user_by_username(
+            session, username=username, user_id=payload.get("uid")
+        )
         if not current_user:
             await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
             return None
@@ -53,24 +58,31 @@ async def authenticate_websocket(
         return None
 
 
-async def send_message_history(websocket: WebSocket, room_id: str, session: Session) -> None:
+async def send_message_history(websocket: WebSocket, room_id: str, session: AsyncSession) -> None:
     """Send recent message history to newly connected client"""
-    messages = session.exec(
-        select(Message)
+    result = await session.exec(
+        select(Message.username, Message.message, Message.created_at)
         .where(Message.room_id == int(room_id))
-        .order_by(Message.created_at.desc())
+        .order_by(Message.created_at.desc(), Message.id.desc())
         .limit(50)
-    ).all()
-
-    for msg in reversed(messages):
-        await websocket.send_json(
-            {
-                "type": "history",
-                "username": msg.username,
-                "message": msg.message,
-                "timestamp": msg.created_at.isoformat(),
-            }
-        )
+    )
+    messages = result.all()
+
+    # one frame for the whole backlog instead of one send per message
+    await send_json(
+        websocket,
+        {
+            "type": "history_batch",
+            "messages": [
+                {
+                    "username": msg.username,
+                    "message": msg.message,
+                    "timestamp": msg.created_at.isoformat(),
+                }
+                for msg in reversed(messages)
+            ],
+        },
+    )
 
 
 @router.websocket("/ws/{room_id}")
@@ -78,13 +90,15 @@ async def websocket_endpoint(
         websocket: WebSocket,
         room_id: str,
         token: str | None = Query(None),
-        session: Session = Depends(get_session),
 ) -> None:
     """Main WebSocket endpoint for room connections"""
     manager = get_room_manager()
 
-    # Authenticate the WebSocket connection
-    auth_result = await authenticate_websocket(websocket, token, session)
+    # Sessions are opened per use rather than held for the life of the
+    # socket, so idle connections don't pin pooled db connections
+    async with async_session() as session:
+        # Authenticate the WebSocket connection
+        auth_result = await authenticate_websocket(websocket, token, session)
     if not auth_result:
         return
 
@@ -93,7 +107,12 @@ async def websocket_endpoint(
 
     try:
         # Send message history to the client
-        await send_message_history(websocket, room_id, session)
+        async with async_session() as session:
+            await send_message_history(websocket, room_id, session)
+
+        # Frames for this client are queued here by the room and written
+        # out by a single sender task; the room enforces the size limit
+        outbox: asyncio.Queue[str] = asyncio.Queue()
 
         # Start concurrent tasks for message handling and broadcasting
         async with anyio.create_task_group() as task_group:
@@ -105,8 +124,8 @@ async def websocket_endpoint(
                     room_id=room_id,
                     user_id=user_id,
                     username=username,
-                    session=session,
                     manager=manager,
+                    outbox=outbox,
                 )
                 task_group.cancel_scope.cancel()
 
@@ -115,7 +134,7 @@ async def websocket_endpoint(
 
             # Handle outgoing broadcasts to this client
             await WebSocketHandler.broadcast_to_client(
-                websocket=websocket, room_id=room_id, manager=manager
+                websocket=websocket, outbox=outbox
             )
 
     except Exception as e:
@@ -123,7 +142,14 @@ async def websocket_endpoint(
         raise
 
 
-async def init_room_manager(broadcast: Broadcast) -> None:
+async def init_room_manager(broadcast: Broadcast | None) -> None:
     """Initialize the global room manager instance"""
     global game_manager
-    game_manager = RoomManager(broadcast)
\ No newline at end of file
+    game_manager = RoomManager(broadcast)
+    game_manager.start()
+
+
+async def shutdown_room_manager() -> None:
+    """Stop background tasks and flush buffered chat messages"""
+    if game_manager is not None:
+        await game_manager.stop()
\ No newline at end of file